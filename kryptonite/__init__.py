@@ -1 +1,2 @@
-from .kryptonite import Tvnz
\ No newline at end of file
+from .kryptonite import Tvnz
+from .pool import TvnzPool
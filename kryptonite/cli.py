@@ -0,0 +1,193 @@
+import argparse
+import json
+import logging
+import os
+import sys
+from datetime import date, timedelta
+import requests
+from requests.adapters import HTTPAdapter
+from .kryptonite import Tvnz
+from .utils import utils
+from .utils.cache import CachingSession, ResponseCache
+from .utils.cassette import Cassette
+from .utils.transport import Http2Session
+
+logger = logging.getLogger(__name__)
+
+
+def _read_ids(path: str):
+    # Lazily read one ID per line from a file, or from stdin if the path is "-", skipping blank lines
+    file = sys.stdin if path == "-" else open(path, encoding="utf-8")
+    try:
+        for line in file:
+            if line.strip():
+                yield line.strip()
+    finally:
+        if file is not sys.stdin:
+            file.close()
+
+
+def _positive_int(value: str) -> int:
+    try:
+        number = int(value)
+    except ValueError:
+        number = 0
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be a positive whole number, not {value!r}")
+    return number
+
+
+def _iso_date(value: str) -> str:
+    try:
+        return date.fromisoformat(value).isoformat()
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"must be a date in the format YYYY-MM-DD, not {value!r}")
+
+
+def _date_range(start: str, end: str):
+    day = date.fromisoformat(start)
+    last = date.fromisoformat(end) if end else day
+    while day <= last:
+        yield day.isoformat()
+        day += timedelta(days=1)
+
+
+def _create_client(args) -> Tvnz:
+    if args.cassette and not args.record:
+        # Replaying never touches the network
+        session = None
+    elif args.http2:
+        session = Http2Session(max_connections=args.concurrency)
+    else:
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=args.concurrency, pool_maxsize=args.concurrency)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+    if args.cassette:
+        session = Cassette(args.cassette, mode="record" if args.record else "replay", session=session)
+    if args.cache_ttl > 0:
+        session = CachingSession(session, ResponseCache(max_size=args.cache_size, ttl=args.cache_ttl))
+    # Requests are made concurrently across IDs, so each individual call is kept serial
+    return Tvnz(api_release=args.api_release, session=session)
+
+
+def _catalog(tvnz: Tvnz, args):
+    show_ids = _read_ids(args.ids) if args.ids else tvnz.get_all_show_ids()
+    fetch = tvnz.get_episodes if args.episodes else tvnz.get_show
+    for show_id, result, error in utils.iter_concurrent(fetch, show_ids, args.concurrency):
+        yield show_id, ({"showId": show_id, "seasons": result} if args.episodes else result), error
+
+
+def _epg(tvnz: Tvnz, args):
+    dates = _date_range(args.start, args.end)
+    for day, schedule, error in utils.iter_concurrent(lambda d: tvnz.get_schedule(args.channel, d), dates,
+                                                      args.concurrency):
+        if error:
+            yield day, None, error
+            continue
+        for channel, programmes in schedule.items():
+            for programme in programmes:
+                yield day, {"date": day, "channel": channel, **programme}, None
+
+
+def _videos(tvnz: Tvnz, args):
+    yield from utils.iter_concurrent(tvnz.get_video, _read_ids(args.ids), args.concurrency)
+
+
+def _search(tvnz: Tvnz, args):
+    for query, results, error in utils.iter_concurrent(tvnz.search, args.queries, args.concurrency):
+        if error:
+            yield query, None, error
+            continue
+        for result in results:
+            yield query, {"query": query, **result}, None
+
+
+def _build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="kryptonite",
+                                     description="Fetch TVNZ metadata in bulk, writing one JSON record per line")
+    parser.add_argument("-o", "--output", default="-", help="file to write JSON lines to (default: stdout)")
+    parser.add_argument("-c", "--concurrency", type=_positive_int, default=4,
+                        help="number of concurrent requests (default: 4)")
+    parser.add_argument("--http2", action="store_true", help="multiplex requests over HTTP/2 (requires httpx)")
+    parser.add_argument("--cache-ttl", type=float, default=300,
+                        help="seconds to cache unauthenticated responses for, 0 to disable (default: 300)")
+    parser.add_argument("--cache-size", type=_positive_int, default=4096, help="maximum number of cached responses")
+    parser.add_argument("--cassette", help="replay responses from this cassette file instead of the network")
+    parser.add_argument("--record", action="store_true", help="record responses to the cassette instead")
+    parser.add_argument("--api-release", default="public", choices=["public", "edge"], help="TVNZ API release")
+    parser.add_argument("-v", "--verbose", action="store_true", help="log every request")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    catalog = commands.add_parser("catalog", help="dump show metadata for every show")
+    catalog.add_argument("--ids", help="file of show IDs, one per line ('-' for stdin), instead of every show")
+    catalog.add_argument("--episodes", action="store_true", help="dump each show's seasons and episodes instead")
+    catalog.set_defaults(run=_catalog)
+
+    epg = commands.add_parser("epg", help="dump EPG programmes for a range of dates")
+    epg.add_argument("--start", type=_iso_date, default=date.today().isoformat(),
+                     help="first date, YYYY-MM-DD (default: today)")
+    epg.add_argument("--end", type=_iso_date, help="last date, YYYY-MM-DD (default: the start date)")
+    epg.add_argument("--channel", help="only dump this channel")
+    epg.set_defaults(run=_epg)
+
+    videos = commands.add_parser("videos", help="dump video metadata for a file of video IDs")
+    videos.add_argument("ids", help="file of video IDs, one per line ('-' for stdin)")
+    videos.set_defaults(run=_videos)
+
+    search = commands.add_parser("search", help="search for shows and videos")
+    search.add_argument("queries", nargs="+", help="one or more queries")
+    search.set_defaults(run=_search)
+
+    return parser
+
+
+def main(argv=None) -> int:
+    parser = _build_parser()
+    args = parser.parse_args(argv)
+    if args.record and not args.cassette:
+        parser.error("--record requires --cassette")
+    # ID files are read lazily, so check they exist now rather than failing part way through
+    ids = getattr(args, "ids", None)
+    if ids and ids != "-" and not os.path.isfile(ids):
+        parser.error(f"ID file not found: {ids}")
+    for name in ("kryptonite", "httpx"):
+        logging.getLogger(name).setLevel(logging.INFO if args.verbose else logging.WARNING)
+
+    try:
+        tvnz = _create_client(args)
+    except (OSError, ValueError, ImportError) as e:
+        parser.error(str(e))
+    try:
+        output = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+    except OSError as e:
+        tvnz.session.close()
+        parser.error(f"Cannot write to {args.output}: {e}")
+    records = 0
+    errors = 0
+    try:
+        for item, record, error in args.run(tvnz, args):
+            if error:
+                logger.error(f"Failed to fetch {item}: {error}")
+                errors += 1
+                continue
+            # Flush every record so downstream jobs can consume the output as it is written
+            output.write(json.dumps(record, ensure_ascii=False) + "\n")
+            output.flush()
+            records += 1
+    except RuntimeError as e:
+        # A request the whole command depends on failed (e.g. listing every show), so nothing more can be fetched
+        logger.error(str(e))
+        return 1
+    finally:
+        if output is not sys.stdout:
+            output.close()
+        # The session was created here rather than by Tvnz, so it is closed here too (saving any recorded cassette)
+        tvnz.session.close()
+
+    logger.info(f"Wrote {records} records with {errors} errors")
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,297 @@
+from datetime import datetime, timezone
+from .utils import utils
+import logging
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+logger = logging.getLogger(__name__)
+
+
+def _schemas() -> dict:
+    timestamp = pa.timestamp("us", tz="UTC")
+    return {
+        "shows": pa.schema([
+            ("show_id", pa.string()),
+            ("title", pa.string()),
+            ("description", pa.string()),
+            ("url", pa.string()),
+            ("show_type", pa.string()),
+            ("release_year", pa.int32()),
+            ("rating", pa.string()),
+            ("episodes_available", pa.int32()),
+            ("seasons_available", pa.int32()),
+            ("categories", pa.list_(pa.string())),
+            ("moods", pa.list_(pa.string())),
+            ("cover_image_url", pa.string()),
+        ]),
+        "episodes": pa.schema([
+            ("show_id", pa.string()),
+            ("season_number", pa.string()),
+            ("episode_number", pa.int32()),
+            ("video_id", pa.string()),
+            ("title", pa.string()),
+            ("description", pa.string()),
+            ("url", pa.string()),
+            ("on_time", timestamp),
+            ("off_time", timestamp),
+            ("duration_seconds", pa.float64()),
+            ("rating", pa.string()),
+            ("brightcove_video_id", pa.string()),
+            ("brightcove_account_id", pa.string()),
+        ]),
+        "schedule": pa.schema([
+            ("date", pa.string()),
+            ("channel", pa.string()),
+            ("show_id", pa.string()),
+            ("title", pa.string()),
+            ("episode_title", pa.string()),
+            ("season_number", pa.string()),
+            ("episode_number", pa.int32()),
+            ("description", pa.string()),
+            ("on_time", timestamp),
+            ("off_time", timestamp),
+            ("duration_seconds", pa.float64()),
+            ("rating", pa.string()),
+        ]),
+    }
+
+
+def _to_int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _to_str(value):
+    return None if value is None else str(value)
+
+
+def _to_timestamp(value):
+    # TVNZ timestamps are ISO 8601, fromisoformat only accepts a trailing "Z" from Python 3.11
+    if not value:
+        return None
+    try:
+        timestamp = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except (TypeError, ValueError):
+        return None
+    return timestamp if timestamp.tzinfo else timestamp.replace(tzinfo=timezone.utc)
+
+
+class _ColumnarWriter:
+    # Buffers rows and writes them out one row group (or record batch) at a time, so memory use stays bounded.
+    # Used as a context manager, so the file is always finished with a valid footer, even if the export fails
+
+    def __init__(self, path: str, schema, row_group_size: int):
+        self.schema = schema
+        self.row_group_size = row_group_size
+        self.rows = []
+        self.rows_written = 0
+        # Write Arrow IPC files for .arrow/.feather paths and Parquet otherwise
+        if path.endswith((".arrow", ".feather")):
+            self.writer = pa.ipc.new_file(path, schema)
+        else:
+            self.writer = pq.ParquetWriter(path, schema)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def write(self, rows: list):
+        self.rows.extend(rows)
+        if len(self.rows) >= self.row_group_size:
+            self.flush()
+
+    def flush(self):
+        if not self.rows:
+            return
+        table = pa.Table.from_pylist(self.rows, schema=self.schema)
+        if isinstance(self.writer, pq.ParquetWriter):
+            self.writer.write_table(table, row_group_size=self.row_group_size)
+        else:
+            for batch in table.to_batches():
+                self.writer.write_batch(batch)
+        self.rows_written += len(self.rows)
+        self.rows = []
+
+    def close(self):
+        try:
+            self.flush()
+        finally:
+            self.writer.close()
+
+
+class CatalogExporter:
+    """
+    A class to export the TVNZ catalog and schedule to columnar Parquet or Arrow files
+
+    Rows are written in row groups of row_group_size as they are fetched, so the whole catalog is never held in memory
+    at once. Files ending in ".arrow" or ".feather" are written in the Arrow IPC format, everything else as Parquet.
+    Shows and dates that fail to fetch or parse are logged and skipped. Requires the optional "export" extra
+    (pip install kryptonite[export]).
+
+    ...
+
+    Attributes
+    ----------
+    tvnz : Tvnz
+        the client used to fetch the metadata
+    row_group_size : int
+        the number of rows written in each row group
+    max_workers : int
+        the number of shows or dates fetched at once, the requests for each one are made one at a time
+
+    Methods
+    -------
+    export_shows(path: str, show_ids: list = None) -> int
+        Exports the metadata for the given shows, or all shows, to a columnar file
+    export_episodes(path: str, show_ids: list = None) -> int
+        Exports the episodes for the given shows, or all shows, to a columnar file
+    export_schedule(path: str, dates: list, channel_name: str = None) -> int
+        Exports the EPG programmes for the given dates to a columnar file
+    """
+
+    def __init__(self, tvnz, row_group_size: int = 10000, max_workers: int = None):
+        if pa is None:
+            raise ImportError("Exporting requires pyarrow, install it with: pip install kryptonite[export]")
+        self.tvnz = tvnz
+        self.row_group_size = row_group_size
+        self.max_workers = max_workers if max_workers is not None else tvnz.max_workers
+        self.schemas = _schemas()
+        # Shows and dates are fetched concurrently, so each one's own requests are made serially to avoid
+        # max_workers squared requests at once
+        self._client = tvnz.clone(max_workers=1)
+
+    def _export(self, path: str, schema: str, to_rows, ids) -> int:
+        # Fetch and convert each ID concurrently, skipping any that fail so one bad ID doesn't abort the export
+        with _ColumnarWriter(path, self.schemas[schema], self.row_group_size) as writer:
+            for item_id, rows, error in utils.iter_concurrent(to_rows, ids, self.max_workers):
+                if error:
+                    logger.error(f"Failed to export {item_id}: {error}")
+                    continue
+                writer.write(rows)
+        return writer.rows_written
+
+    def _show_rows(self, show_id: str) -> list:
+        show = self._client.get_show(show_id)
+        return [{
+            "show_id": _to_str(show["showId"]),
+            "title": show["title"],
+            "description": show["description"],
+            "url": show["url"],
+            "show_type": show["showType"],
+            "release_year": _to_int(show["releaseYear"]),
+            "rating": show["rating"],
+            "episodes_available": _to_int(show["episodesAvailable"]),
+            "seasons_available": _to_int(show["seasonsAvailable"]),
+            "categories": [category["name"] for category in show["categories"]],
+            "moods": show["moods"],
+            "cover_image_url": show["coverImage"]["url"],
+        }]
+
+    def _episode_rows(self, show_id: str) -> list:
+        rows = []
+        for season in self._client.get_episodes(show_id):
+            # Movies use the get_video format, which names some fields differently to parseSeasonData
+            season_number = season.get("season_number", season.get("seasonNumber"))
+            for episode in season["episodes"]:
+                rows.append({
+                    "show_id": _to_str(show_id),
+                    "season_number": _to_str(season_number),
+                    "episode_number": _to_int(episode.get("episodeNumber")),
+                    "video_id": _to_str(episode["videoId"]),
+                    "title": episode["title"],
+                    "description": episode["description"],
+                    "url": episode["url"],
+                    "on_time": _to_timestamp(episode["onTime"]),
+                    "off_time": _to_timestamp(episode["offTime"]),
+                    "duration_seconds": utils.durationSeconds(episode["duration"]),
+                    "rating": episode["rating"],
+                    "brightcove_video_id": _to_str(episode["brightcove"].get("video_id",
+                                                                             episode["brightcove"].get("videoId"))),
+                    "brightcove_account_id": _to_str(episode["brightcove"]["accountId"]),
+                })
+        return rows
+
+    def _schedule_rows(self, day: str, channel_name: str = None) -> list:
+        rows = []
+        for channel, programmes in self._client.get_schedule(channel_name, day).items():
+            for programme in programmes:
+                rows.append({
+                    "date": day,
+                    "channel": channel,
+                    "show_id": _to_str(programme["showId"]),
+                    "title": programme["title"],
+                    "episode_title": programme["episodeTitle"],
+                    "season_number": _to_str(programme["seasonNumber"]),
+                    "episode_number": _to_int(programme["episodeNumber"]),
+                    "description": programme["description"],
+                    "on_time": _to_timestamp(programme["onTime"]),
+                    "off_time": _to_timestamp(programme["offTime"]),
+                    "duration_seconds": utils.durationSeconds(programme["duration"]),
+                    "rating": programme["rating"],
+                })
+        return rows
+
+    def export_shows(self, path: str, show_ids: list = None) -> int:
+        """
+        Exports the metadata for the given shows, or all shows, to a columnar file
+
+        Parameters:
+            path (str): The file to write to, e.g. "shows.parquet"
+            show_ids (list): The IDs of the shows to export, or None to export every show
+
+        Returns:
+            int: The number of rows written
+        """
+        show_ids = show_ids if show_ids is not None else self._client.get_all_show_ids()
+
+        logger.info(f"Exporting {len(show_ids)} shows to {path}")
+        rows = self._export(path, "shows", self._show_rows, show_ids)
+        logger.info(f"Exported {rows} shows to {path}")
+
+        return rows
+
+    def export_episodes(self, path: str, show_ids: list = None) -> int:
+        """
+        Exports the episodes for the given shows, or all shows, to a columnar file
+
+        Parameters:
+            path (str): The file to write to, e.g. "episodes.parquet"
+            show_ids (list): The IDs of the shows to export the episodes for, or None to export every show
+
+        Returns:
+            int: The number of rows written
+        """
+        show_ids = show_ids if show_ids is not None else self._client.get_all_show_ids()
+
+        logger.info(f"Exporting episodes for {len(show_ids)} shows to {path}")
+        rows = self._export(path, "episodes", self._episode_rows, show_ids)
+        logger.info(f"Exported {rows} episodes to {path}")
+
+        return rows
+
+    def export_schedule(self, path: str, dates: list, channel_name: str = None) -> int:
+        """
+        Exports the EPG programmes for the given dates to a columnar file
+
+        Parameters:
+            path (str): The file to write to, e.g. "schedule.parquet"
+            dates (list): The dates to export the schedule for in the format "YYYY-MM-DD"
+            channel_name (str): The name of the channel to export the schedule for, or None for all channels
+
+        Returns:
+            int: The number of rows written
+        """
+        logger.info(f"Exporting schedule for {len(dates)} dates to {path}")
+        rows = self._export(path, "schedule", lambda day: self._schedule_rows(day, channel_name), dates)
+        logger.info(f"Exported {rows} programmes to {path}")
+
+        return rows
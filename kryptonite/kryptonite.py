@@ -1,17 +1,22 @@
 import requests
+from requests.adapters import DEFAULT_POOLSIZE, HTTPAdapter
 from .utils import decrypter, utils
+from .utils.transport import Http2Session
+from .utils.cassette import Cassette
 import yt_dlp
 import subprocess
 import os
 import shutil
 from .utils.decorators import requires_login
-from requests.exceptions import RequestException
 import logging
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# The number of IDs get_videos and get_shows fetch at once when neither they nor the client are given a max_workers
+BATCH_WORKERS = 8
+
 
 class Tvnz:
     """
@@ -29,6 +34,11 @@ class Tvnz:
         the policy key for the TVNZ API
     authorization : str
         the authorization token for the TVNZ API
+    session : requests.Session | Http2Session
+        the session used for all requests, an Http2Session if HTTP/2 was requested, wrapped in a Cassette if one
+        was given, or the shared session passed in
+    max_workers : int
+        the maximum number of concurrent requests used when fetching seasons and schedules
 
     Methods
     -------
@@ -40,6 +50,10 @@ class Tvnz:
         Gets the schedule for a given channel on a given date
     getVideo(video_id: str) -> dict
         Gets the metadata for a video with the given ID
+    get_videos(video_ids: list, max_workers: int = None) -> dict
+        Gets the metadata for many videos concurrently, collecting any failures
+    get_shows(show_ids: list, max_workers: int = None) -> dict
+        Gets the metadata for many shows and movies concurrently, collecting any failures
     search(query: str) -> list
         Searches the TVNZ API for shows and videos matching the given query
     getCategory(category_name: str) -> dict
@@ -52,16 +66,75 @@ class Tvnz:
         Gets the subtitles for a video with the given ID
     login() -> str
         Logs into the TVNZ API and returns the authorization token
+    clone(session=None, max_workers: int = None) -> Tvnz
+        Creates a client with the same login and active profile that shares this client's session
+    close()
+        Closes the underlying session and its connections, saving the cassette if one is being recorded
     """
 
-    def __init__(self, api_release="public", authorization=None):
+    def __init__(self, api_release="public", authorization=None, http2=False, max_workers=1, cassette=None,
+                 cassette_mode="replay", session=None):
         self.API_RELEASE = api_release
         self.BASE_URL = f"https://apis-{self.API_RELEASE}-prod.tech.tvnz.co.nz"
         self.POLICY_KEY = ("BCpkADawqM1N12WMDn4W-_kPR1HP17qWAzLwRMnN2S11amDldHxufQMiBfcXaYthGVkx1iJgFCAkbCAJ0R-z8S"
                            "-gWFcZg7BcmerduckK-Lycyvgpe4prhFDj6jCMrXMq4F5lS5FVEymSDlpMK2-lK87-RK62ifeRgK7m_Q")
         self.authorization = authorization
         self.activeProfile = None
-        self.session = requests.Session()
+        self.max_workers = max_workers
+        # A session passed in (e.g. by a TvnzPool) is shared with other clients, so it is left open by close()
+        self._owns_session = session is None
+        if session is not None:
+            self.session = session
+        elif cassette and cassette_mode == "replay":
+            # Replaying a cassette never touches the network, so no session (or httpx, for HTTP/2) is needed
+            self.session = None
+        else:
+            # HTTP/2 multiplexes concurrent requests to the same host over a single connection
+            self.session = Http2Session() if http2 else requests.Session()
+            if not http2:
+                # Keep a pooled connection for every worker, rather than discarding them once more than 10 are open
+                adapter = HTTPAdapter(pool_maxsize=max(max_workers, DEFAULT_POOLSIZE))
+                self.session.mount("https://", adapter)
+                self.session.mount("http://", adapter)
+        # Record responses to, or replay them from, a cassette file instead of relying on the network
+        if cassette:
+            self.session = Cassette(cassette, mode=cassette_mode, session=self.session)
+
+    def _get_json(self, url: str, headers=None) -> dict:
+        return utils.get_json(url, headers=headers, session=self.session)
+
+    def clone(self, session=None, max_workers: int = None):
+        """
+        Creates a client with the same login and active profile that shares this client's session
+
+        Parameters:
+            session: The session for the new client to use instead, e.g. this client's session wrapped in another
+            max_workers (int): The maximum number of concurrent requests for the new client, or None to keep this
+            client's setting
+
+        Returns:
+            Tvnz: The new client, closing it leaves the shared session open
+        """
+        client = Tvnz(api_release=self.API_RELEASE, authorization=self.authorization,
+                      max_workers=max_workers if max_workers is not None else self.max_workers,
+                      session=session if session is not None else self.session)
+        client.activeProfile = self.activeProfile
+        return client
+
+    def close(self):
+        """
+        Closes the underlying session and its connections, saving the cassette if one is being recorded
+        """
+        if self._owns_session:
+            self.session.close()
+        elif isinstance(self.session, Cassette) and self.session.recording:
+            self.session.save()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
 
     def get_show(self, show_id: str) -> dict:
         """
@@ -74,12 +147,8 @@ class Tvnz:
             dict: The metadata for the show or movie with the given ID
         """
         video_url = f"{self.BASE_URL}/api/v1/web/play/shows/{show_id}"
-        try:
-            logger.info(f"Fetching show metadata for show {show_id}")
-            show_metadata = utils.get_json(video_url)
-        except RequestException as e:
-            logger.error(f"Failed to fetch show metadata: {e}")
-            return {}
+        logger.info(f"Fetching show metadata for show {show_id}")
+        show_metadata = self._get_json(video_url)
         logger.info(f"Show metadata received for show {show_id}")
         return utils.process_show(show_metadata)
 
@@ -96,7 +165,7 @@ class Tvnz:
         """
         show_url = f"{self.BASE_URL}/api/v1/web/play/shows/{show_id}"
         logger.info(f"Fetching show metadata for show {show_id}")
-        show_metadata = utils.get_json(show_url)
+        show_metadata = self._get_json(show_url)
         logger.info(f"Show metadata received for show {show_id}")
 
         episodes = []
@@ -105,19 +174,20 @@ class Tvnz:
         if show_metadata["showType"] == "Episodic":
             # Get a list of seasons from TVNZ api
             season_list = \
-                utils.get_json(f"{self.BASE_URL}{show_metadata['page']['href']}/episodes")["layout"]["slots"]["main"][
+                self._get_json(f"{self.BASE_URL}{show_metadata['page']['href']}/episodes")["layout"]["slots"]["main"][
                     "modules"][0]["lists"]
 
-            # Iterate through each season, adding its episodes to the last
-            for season in season_list:
-                # Check if season number matches the one requested, or, if none was requested, get all the seasons
-                if season_number is None or season["baseHref"].endswith(f"/{season_number}"):
-                    # Get the metadata for the season and add it to the episode list
-                    season_data = utils.get_json(self.BASE_URL + season["baseHref"])
-                    episodes.append(utils.parseSeasonData(season_data))
-                    # If a season number was requested, break the loop
-                    if season_number:
-                        break
+            # Check if season number matches the one requested, or, if none was requested, get all the seasons
+            season_hrefs = [season["baseHref"] for season in season_list
+                            if season_number is None or season["baseHref"].endswith(f"/{season_number}")]
+            # If a season number was requested, only get the first match
+            if season_number:
+                season_hrefs = season_hrefs[:1]
+
+            # Get the metadata for each season concurrently and add its episodes to the list
+            season_data = utils.map_concurrent(lambda href: self._get_json(self.BASE_URL + href), season_hrefs,
+                                               self.max_workers)
+            episodes.extend(utils.parseSeasonData(data) for data in season_data)
 
         elif show_metadata["showType"] == "Movie":
             video_info = self.get_video(show_metadata["watchAction"]["videoHref"].split("/")[-1])
@@ -145,13 +215,13 @@ class Tvnz:
         channel_urls = [
             f"{self.BASE_URL}/api/v1/web/play/epg/channels/{channel_name}/schedule?date={date}"] if channel_name else [
             self.BASE_URL + channel for channel in
-            utils.get_json(f"{self.BASE_URL}/api/v1/web/play/epg/schedule?date={date}")["epgChannels"]
+            self._get_json(f"{self.BASE_URL}/api/v1/web/play/epg/schedule?date={date}")["epgChannels"]
         ]
         logger.info(f"Schedule received for channel {channel_name} on date {date}")
 
         logger.info(f"Extracting schedule for channel {channel_name} on date {date}")
-        for channel in channel_urls:
-            channel_schedule = utils.get_json(channel)
+        channel_schedules = utils.map_concurrent(self._get_json, channel_urls, self.max_workers)
+        for channel, channel_schedule in zip(channel_urls, channel_schedules):
             programs = [{
                 "title": channel_schedule["_embedded"][program]["title"],
                 "episodeTitle": channel_schedule["_embedded"][program]["episodeName"],
@@ -183,7 +253,7 @@ class Tvnz:
         """
         video_url = f"{self.BASE_URL}/api/v1/web/play/video/{video_id}"
         logger.info(f"Fetching video metadata for video {video_id}")
-        video_metadata = utils.get_json(video_url)
+        video_metadata = self._get_json(video_url)
         logger.info(f"Video metadata received for video {video_id}")
 
         logger.info(f"Extracting video info for video {video_id}")
@@ -214,6 +284,60 @@ class Tvnz:
 
         return video_info
 
+    def get_videos(self, video_ids: list, max_workers: int = None) -> dict:
+        """
+        Gets the metadata for many videos concurrently, collecting any failures rather than stopping at the first
+
+        Parameters:
+            video_ids (list): The IDs of the videos to get the metadata for
+            max_workers (int): The maximum number of videos to fetch at once, or None to use the client's max_workers
+            if it is above 1, or 8 otherwise
+
+        Returns:
+            dict: "results", mapping each video ID to its metadata, and "errors", mapping each video ID that failed
+            to its error message
+        """
+        return self._get_batch(self.get_video, video_ids, max_workers)
+
+    def get_shows(self, show_ids: list, max_workers: int = None) -> dict:
+        """
+        Gets the metadata for many shows and movies concurrently, collecting any failures rather than stopping at
+        the first
+
+        Parameters:
+            show_ids (list): The IDs of the shows or movies to get the metadata for
+            max_workers (int): The maximum number of shows to fetch at once, or None to use the client's max_workers
+            if it is above 1, or 8 otherwise
+
+        Returns:
+            dict: "results", mapping each show ID to its metadata, and "errors", mapping each show ID that failed
+            to its error message
+        """
+        return self._get_batch(self.get_show, show_ids, max_workers)
+
+    def _get_batch(self, func, ids: list, max_workers: int = None) -> dict:
+        batch = {"results": {}, "errors": {}}
+        if max_workers is None:
+            # A client with the default max_workers of 1 only makes a single call's requests serially, batches of
+            # independent IDs are still fetched concurrently
+            max_workers = self.max_workers if self.max_workers > 1 else BATCH_WORKERS
+        # Drop duplicate IDs while keeping their order, so each is only fetched once
+        ids = list(dict.fromkeys(ids))
+
+        logger.info(f"Fetching {len(ids)} items with up to {max_workers} workers")
+        for item_id, result, error in utils.iter_concurrent(func, ids, max_workers):
+            if error:
+                logger.error(f"Failed to fetch {item_id}: {error}")
+                batch["errors"][item_id] = str(error)
+            else:
+                batch["results"][item_id] = result
+        logger.info(f"Fetched {len(batch['results'])} items with {len(batch['errors'])} errors")
+
+        # Items finish in any order, so put the results back in the order they were requested
+        batch["results"] = {item_id: batch["results"][item_id] for item_id in ids if item_id in batch["results"]}
+
+        return batch
+
     def search(self, query: str) -> list:
         """
         Searches the TVNZ API for shows and movies matching the given query
@@ -225,7 +349,7 @@ class Tvnz:
             list: A list of shows and movies matching the given query
         """
         logger.info(f"Searching for query {query}")
-        search_results = utils.get_json(f"{self.BASE_URL}/api/v1/web/play/search?q={query}&includeTypes=show")
+        search_results = self._get_json(f"{self.BASE_URL}/api/v1/web/play/search?q={query}&includeTypes=show")
         logger.info(f"Search results received for query {query}")
         results = []
 
@@ -292,7 +416,7 @@ class Tvnz:
             dict: The shows and movies in the category with the given name
         """
         logger.info(f"Fetching category page for category {category_name}")
-        category_page = utils.get_json(f"{self.BASE_URL}/api/v1/web/play/page/categories/{category_name}")
+        category_page = self._get_json(f"{self.BASE_URL}/api/v1/web/play/page/categories/{category_name}")
         category_info = {
             "title": category_page["title"],
             "description": category_page["metadata"]["description"],
@@ -318,7 +442,7 @@ class Tvnz:
             list: A list of all show and movie IDs
         """
         logger.info("Fetching all show IDs")
-        show_list = utils.get_json(f"{self.BASE_URL}/api/v1/web/play/shows")
+        show_list = self._get_json(f"{self.BASE_URL}/api/v1/web/play/shows")
         logger.info("Show IDs received")
         return [show.split("/")[-1] for show in show_list]
 
@@ -340,7 +464,7 @@ class Tvnz:
         video_info = self.get_video(video_id)
         logger.info(f"Getting playback information for video {video_id}")
         playback_info_url = f"https://playback.brightcovecdn.com/playback/v1/accounts/{video_info['brightcove']['accountId']}/videos/{video_info['brightcove']['videoId']}"
-        playback_info = utils.get_json(playback_info_url, headers={"Accept": f"application/json;pk={self.POLICY_KEY}"})
+        playback_info = self._get_json(playback_info_url, headers={"Accept": f"application/json;pk={self.POLICY_KEY}"})
         logger.info(f"Playback information received for video {video_id}")
 
         # Get the decryption keys for the video
@@ -414,7 +538,7 @@ class Tvnz:
         video_info = self.get_video(video_id)
         logger.info(f"Getting playback information for video {video_id}")
         playback_info_url = f"https://playback.brightcovecdn.com/playback/v1/accounts/{video_info['brightcove']['accountId']}/videos/{video_info['brightcove']['videoId']}"
-        playback_info = utils.get_json(playback_info_url, headers={"Accept": f"application/json;pk={self.POLICY_KEY}"})
+        playback_info = self._get_json(playback_info_url, headers={"Accept": f"application/json;pk={self.POLICY_KEY}"})
         logger.info(f"Playback information received for video {video_id}")
 
         # Get the subtitles url and download the subtitles
@@ -465,7 +589,7 @@ class Tvnz:
         }, cookies=auth.cookies, allow_redirects=True)
         logger.info("Access token received")
 
-        self.authorization = access_token.url.split("access_token=")[1].split("&")[0]
+        self.authorization = str(access_token.url).split("access_token=")[1].split("&")[0]
 
         return self.authorization
 
@@ -478,7 +602,7 @@ class Tvnz:
             dict: The profile information for the logged-in user
         """
         logger.info("Fetching user info")
-        profile_data = utils.get_json(f"{self.BASE_URL}/api/v1/web/consumer/account",
+        profile_data = self._get_json(f"{self.BASE_URL}/api/v1/web/consumer/account",
                                       headers={"Authorization": f"Bearer {self.authorization}"})
         logger.info("User info received")
 
@@ -516,7 +640,7 @@ class Tvnz:
             list: The profile icons available for use
         """
         logger.info("Fetching profile icons")
-        profile_data = utils.get_json(f"{self.BASE_URL}/api/v1/web/consumer/profile-icons",
+        profile_data = self._get_json(f"{self.BASE_URL}/api/v1/web/consumer/profile-icons",
                                       headers={"Authorization": f"Bearer {self.authorization}"})
         logger.info("Profile icons received")
 
@@ -554,7 +678,7 @@ class Tvnz:
         """
 
         logger.info("Fetching watched videos")
-        watched_data = utils.get_json(f"https://apis-public-prod.tvnz.io/user/v1/play-state", headers={
+        watched_data = self._get_json(f"https://apis-public-prod.tvnz.io/user/v1/play-state", headers={
             "Authorization": f"Bearer {self.authorization}",
             "x-tvnz-active-profile-id": self.activeProfile
         })
@@ -581,7 +705,7 @@ class Tvnz:
             list: The videos the logged-in user has added to their watchlist
         """
         logger.info("Fetching watchlist")
-        watch_list_data = utils.get_json(f"{self.BASE_URL}/api/v1/web/play/page/categories/my-list", headers={
+        watch_list_data = self._get_json(f"{self.BASE_URL}/api/v1/web/play/page/categories/my-list", headers={
             "Authorization": f"Bearer {self.authorization}",
             "x-tvnz-active-profile-id": self.activeProfile
         })
@@ -0,0 +1,84 @@
+import requests
+from http.cookiejar import DefaultCookiePolicy
+from requests.adapters import HTTPAdapter
+from .kryptonite import Tvnz
+from .utils.cache import CachingSession, ResponseCache
+from .utils.transport import Http2Session
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class TvnzPool:
+    """
+    A pool of TVNZ clients for many users that share connections and a response cache
+
+    Each client handed out by the pool keeps its own authorization token and active profile, but they all send
+    requests through one shared session. Responses to unauthenticated requests (shows, episodes, schedules, etc.) are
+    cached and shared between every client, while requests carrying a user's authorization are never cached. The shared
+    session does not store cookies, so no login state leaks between users.
+
+    ...
+
+    Attributes
+    ----------
+    api_release : str
+        the release of the TVNZ API used by clients from this pool
+    cache : ResponseCache
+        the response cache shared by every client from this pool
+    session : CachingSession
+        the session shared by every client from this pool
+
+    Methods
+    -------
+    client(authorization: str = None) -> Tvnz
+        Creates a client for a single user that shares this pool's connections and cache
+    close()
+        Closes the shared session and its connections
+    """
+
+    def __init__(self, api_release="public", http2=False, max_connections=64, max_workers=1, cache_size=4096,
+                 cache_ttl=300):
+        self.api_release = api_release
+        self.max_workers = max_workers
+
+        if http2:
+            session = Http2Session(max_connections=max_connections)
+            cookies = session.client.cookies.jar
+        else:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=max_connections, pool_maxsize=max_connections)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            cookies = session.cookies
+        # Refuse to store any cookies, as they would otherwise be sent on behalf of every user
+        cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+
+        self.cache = ResponseCache(max_size=cache_size, ttl=cache_ttl)
+        self.session = CachingSession(session, self.cache)
+
+    def client(self, authorization: str = None) -> Tvnz:
+        """
+        Creates a client for a single user that shares this pool's connections and cache
+
+        Parameters:
+            authorization (str): The user's authorization token, or None to log in later or stay logged out
+
+        Returns:
+            Tvnz: A client whose login and active profile are isolated from every other client
+        """
+        return Tvnz(api_release=self.api_release, authorization=authorization, max_workers=self.max_workers,
+                    session=self.session)
+
+    def close(self):
+        """
+        Closes the shared session and its connections
+        """
+        logger.info(f"Closing pool, cache hits: {self.cache.hits}, misses: {self.cache.misses}")
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -0,0 +1,348 @@
+import heapq
+import itertools
+import time
+from datetime import date
+from .utils.cache import CachingSession
+from .utils.ratelimit import DeadlineExceeded, RateLimitedSession
+import logging
+
+logger = logging.getLogger(__name__)
+
+MINUTE = 60
+HOUR = 60 * MINUTE
+
+
+class CrawlJob:
+    """
+    A metadata refresh that is run repeatedly by a CrawlScheduler
+
+    ...
+
+    Attributes
+    ----------
+    key : str
+        the unique name of the job, e.g. "show:189156"
+    func : callable
+        the function that fetches the metadata
+    args : tuple
+        the arguments passed to func
+    interval : float
+        the number of seconds between refreshes for a job with a popularity of 1
+    popularity : float
+        how much the job matters, popular jobs are refreshed more often and run first when the budget is tight
+    last_run : float
+        the time.monotonic() time the job last ran, or None if it hasn't run yet
+    next_run : float
+        the time.monotonic() time the job is next due
+    failures : int
+        the number of times in a row the job has failed
+    """
+
+    def __init__(self, key: str, func, args: tuple, interval: float, popularity: float):
+        self.key = key
+        self.func = func
+        self.args = args
+        self.interval = interval
+        self.popularity = popularity
+        self.last_run = None
+        self.next_run = time.monotonic()
+        self.failures = 0
+        # Incremented whenever the job is rescheduled, so outdated heap entries can be recognised and skipped
+        self.version = 0
+
+    @property
+    def refresh_interval(self) -> float:
+        # A job twice as popular is refreshed twice as often
+        return self.interval / max(self.popularity, 0.01)
+
+
+class CrawlScheduler:
+    """
+    A class to keep TVNZ metadata fresh within a global request budget
+
+    Jobs are refreshed once they are stale, which happens sooner the more popular they are. When more jobs are due
+    than the budget allows, they are run in order of how long they have been due, with each unit of popularity
+    counting as an extra `aging` seconds. Popular jobs go first, but a job that has waited long enough will always
+    run eventually. The scheduler only holds its jobs, not their results, which are passed to on_result as each job
+    finishes.
+
+    The scheduler makes its requests through its own copy of the client, with a rate limited session wrapped around
+    the client's session. The client passed in, and any other clients sharing its session (e.g. from a TvnzPool), are
+    left unchanged, so only the scheduler's own requests count towards requests_per_minute. Responses served from a
+    CachingSession don't use any of the budget. A job that would have to wait for the budget past the end of a run is
+    stopped and left due, so it runs first next time.
+
+    ...
+
+    Attributes
+    ----------
+    tvnz : Tvnz
+        the scheduler's own copy of the client passed in, whose requests are rate limited
+    budget : RateLimitedSession
+        the rate limiter for the scheduler's requests
+    requests_per_minute : int
+        the maximum number of requests the scheduler sends in any 60 second window
+    aging : float
+        the number of seconds of waiting each unit of popularity is worth when choosing between due jobs
+    max_jobs : int
+        the maximum number of jobs the scheduler will hold
+    on_result : callable
+        called with (key, result, error) each time a job finishes, error is None if it succeeded
+
+    Methods
+    -------
+    add_job(key: str, func, *args, interval: float, popularity: float = 1.0) -> CrawlJob
+        Adds a job, or updates the job with the same key
+    add_show(show_id: str, popularity: float = 1.0, interval: float = 6 * HOUR) -> CrawlJob
+        Adds a job refreshing a show's metadata
+    add_episodes(show_id: str, popularity: float = 1.0, interval: float = 6 * HOUR) -> CrawlJob
+        Adds a job refreshing a show's episodes
+    add_schedule(date: str = None, channel_name: str = None, popularity: float = 1.0, interval: float = 15 * MINUTE)
+        Adds a job refreshing the EPG for a date, or for the current day if no date is given
+    remove_job(key: str)
+        Removes a job
+    run_pending() -> int
+        Runs every job that is due and fits within the request budget
+    run(duration: float = None, max_runs: int = None) -> int
+        Runs jobs as they become due until the duration or number of runs is reached
+    """
+
+    def __init__(self, tvnz, requests_per_minute: int = 60, max_jobs: int = 100000, on_result=None,
+                 aging: float = MINUTE):
+        self.requests_per_minute = requests_per_minute
+        self.aging = aging
+        self.max_jobs = max_jobs
+        self.on_result = on_result
+        self.jobs = {}
+        # Jobs waiting until they are due, ordered by when they are due
+        self._waiting = []
+        # Jobs that are due, ordered by when they were due less their popularity times aging
+        self._ready = []
+        self._counter = itertools.count()
+
+        # Rate limit below any response cache, so cache hits don't use up the budget. The limiter wraps the session
+        # rather than replacing it, so other clients using the same session aren't limited
+        if isinstance(tvnz.session, CachingSession):
+            self.budget = RateLimitedSession(tvnz.session.session, requests_per_minute)
+            session = CachingSession(self.budget, tvnz.session.cache)
+        else:
+            self.budget = RateLimitedSession(tvnz.session, requests_per_minute)
+            session = self.budget
+        self.tvnz = tvnz.clone(session=session)
+
+    def add_job(self, key: str, func, *args, interval: float, popularity: float = 1.0) -> CrawlJob:
+        """
+        Adds a job, or updates the job with the same key
+
+        Parameters:
+            key (str): The unique name of the job
+            func (callable): The function that fetches the metadata
+            *args: The arguments passed to func
+            interval (float): The number of seconds between refreshes for a job with a popularity of 1
+            popularity (float): How much the job matters, popular jobs are refreshed more often and run first
+
+        Returns:
+            CrawlJob: The added or updated job
+        """
+        job = self.jobs.get(key)
+        if job is None:
+            if len(self.jobs) >= self.max_jobs:
+                raise RuntimeError(f"Cannot add job {key}, the scheduler already has {self.max_jobs} jobs")
+            job = CrawlJob(key, func, args, interval, popularity)
+            self.jobs[key] = job
+            self._schedule(job)
+            return job
+
+        next_run, old_popularity = job.next_run, job.popularity
+        job.func, job.args, job.interval, job.popularity = func, args, interval, popularity
+        if job.last_run is not None and not job.failures:
+            job.next_run = job.last_run + job.refresh_interval
+        # Only reschedule if the job's place in the queues has changed, so repeated updates don't fill the heaps
+        if job.next_run != next_run or job.popularity != old_popularity:
+            self._schedule(job)
+        return job
+
+    def add_show(self, show_id: str, popularity: float = 1.0, interval: float = 6 * HOUR) -> CrawlJob:
+        """
+        Adds a job refreshing a show's metadata
+
+        Parameters:
+            show_id (str): The ID of the show or movie
+            popularity (float): How much the show matters, popular shows are refreshed more often
+            interval (float): The number of seconds between refreshes for a popularity of 1
+
+        Returns:
+            CrawlJob: The added or updated job
+        """
+        return self.add_job(f"show:{show_id}", self.tvnz.get_show, show_id, interval=interval, popularity=popularity)
+
+    def add_episodes(self, show_id: str, popularity: float = 1.0, interval: float = 6 * HOUR) -> CrawlJob:
+        """
+        Adds a job refreshing a show's episodes
+
+        Parameters:
+            show_id (str): The ID of the show
+            popularity (float): How much the show matters, popular shows are refreshed more often
+            interval (float): The number of seconds between refreshes for a popularity of 1
+
+        Returns:
+            CrawlJob: The added or updated job
+        """
+        return self.add_job(f"episodes:{show_id}", self.tvnz.get_episodes, show_id, interval=interval,
+                            popularity=popularity)
+
+    def add_schedule(self, date: str = None, channel_name: str = None, popularity: float = 1.0,
+                     interval: float = 15 * MINUTE) -> CrawlJob:
+        """
+        Adds a job refreshing the EPG for a date, or for the current day if no date is given
+
+        Parameters:
+            date (str): The date in the format "YYYY-MM-DD", or None to always refresh the current day
+            channel_name (str): The name of the channel, or None for all channels
+            popularity (float): How much the schedule matters, popular schedules are refreshed more often
+            interval (float): The number of seconds between refreshes for a popularity of 1
+
+        Returns:
+            CrawlJob: The added or updated job
+        """
+        key = f"schedule:{channel_name or 'all'}:{date or 'today'}"
+        return self.add_job(key, self._get_schedule, channel_name, date, interval=interval, popularity=popularity)
+
+    def _get_schedule(self, channel_name: str, day: str):
+        # Work out the current day when the job runs, so a "today" job rolls over at midnight
+        return self.tvnz.get_schedule(channel_name, day or date.today().isoformat())
+
+    def remove_job(self, key: str):
+        """
+        Removes a job
+
+        Parameters:
+            key (str): The unique name of the job to remove
+        """
+        job = self.jobs.pop(key, None)
+        if job is not None:
+            # Any heap entries for the job are now outdated and will be skipped, or dropped by _compact
+            job.version += 1
+            self._compact()
+
+    def _schedule(self, job: CrawlJob):
+        job.version += 1
+        heapq.heappush(self._waiting, (job.next_run, next(self._counter), job.version, job))
+        self._compact()
+
+    def _compact(self):
+        # Outdated heap entries are normally skipped when they come up, rebuild the heaps if they start to pile up
+        if len(self._waiting) + len(self._ready) <= 2 * len(self.jobs) + 16:
+            return
+        self._ready = []
+        self._waiting = []
+        for job in self.jobs.values():
+            job.version += 1
+            self._waiting.append((job.next_run, next(self._counter), job.version, job))
+        heapq.heapify(self._waiting)
+
+    def _next_job(self, now: float):
+        # Move every job that is now due into the ready queue, then take the highest priority one
+        while self._waiting and self._waiting[0][0] <= now:
+            next_run, _, version, job = heapq.heappop(self._waiting)
+            if version == job.version and self.jobs.get(job.key) is job:
+                heapq.heappush(self._ready, (next_run - job.popularity * self.aging, next(self._counter), job.version,
+                                             job))
+        while self._ready:
+            _, _, version, job = heapq.heappop(self._ready)
+            if version == job.version and self.jobs.get(job.key) is job:
+                return job
+        return None
+
+    def _run_job(self, job: CrawlJob):
+        logger.info(f"Refreshing {job.key}")
+        try:
+            result, error = job.func(*job.args), None
+        except DeadlineExceeded:
+            # Out of time rather than failed, so put the job back as it was to run first next time
+            logger.info(f"Stopped refreshing {job.key}, there isn't enough request budget left")
+            self._schedule(job)
+            raise
+        except Exception as e:
+            result, error = None, e
+        now = time.monotonic()
+
+        if error:
+            job.failures += 1
+            # Retry failed jobs with an exponential backoff, but never less often than they would normally refresh
+            job.next_run = now + min(job.refresh_interval, MINUTE * 2 ** min(job.failures - 1, 10))
+            logger.error(f"Failed to refresh {job.key}: {error}")
+        else:
+            job.failures = 0
+            job.last_run = now
+            job.next_run = now + job.refresh_interval
+        self._schedule(job)
+
+        if self.on_result:
+            self.on_result(job.key, result, error)
+
+    def run_pending(self) -> int:
+        """
+        Runs every job that is due and fits within the request budget
+
+        Returns:
+            int: The number of jobs run
+        """
+        runs = 0
+        # Jobs needing more requests than the budget has left are stopped rather than waiting for it
+        self.budget.deadline = time.monotonic()
+        try:
+            while self.budget.wait_time() == 0:
+                job = self._next_job(time.monotonic())
+                if job is None:
+                    break
+                self._run_job(job)
+                runs += 1
+        except DeadlineExceeded:
+            pass
+        finally:
+            self.budget.deadline = None
+        return runs
+
+    def run(self, duration: float = None, max_runs: int = None) -> int:
+        """
+        Runs jobs as they become due until the duration or number of runs is reached
+
+        Parameters:
+            duration (float): The number of seconds to run for, or None to run forever
+            max_runs (int): The number of jobs to run before stopping, or None for no limit
+
+        Returns:
+            int: The number of jobs run
+        """
+        deadline = time.monotonic() + duration if duration is not None else None
+        runs = 0
+        # Stop a job part way through rather than letting it wait for the budget past the end of the run
+        self.budget.deadline = deadline
+
+        try:
+            while max_runs is None or runs < max_runs:
+                now = time.monotonic()
+                if deadline is not None and now >= deadline:
+                    break
+
+                # Wait for the budget to free up before taking a job, so the most important job is run when it does
+                wait = self.budget.wait_time()
+                job = self._next_job(now) if wait == 0 else None
+                if job is not None:
+                    self._run_job(job)
+                    runs += 1
+                    continue
+
+                if wait == 0:
+                    # Nothing is due, so sleep until the next job is (or a minute, if there are no jobs)
+                    wait = self._waiting[0][0] - now if self._waiting else MINUTE
+                if deadline is not None:
+                    wait = min(wait, deadline - now)
+                time.sleep(max(wait, 0))
+        except DeadlineExceeded:
+            pass
+        finally:
+            self.budget.deadline = None
+
+        return runs
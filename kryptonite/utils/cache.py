@@ -0,0 +1,104 @@
+import threading
+import time
+from collections import OrderedDict
+from .utils import build_response
+
+# Requests sending any of these headers are user-specific, so their responses are never cached
+PRIVATE_HEADERS = ("authorization", "x-tvnz-active-profile-id")
+
+
+class ResponseCache:
+    """
+    A thread-safe, size-bounded cache of responses that expire after a fixed time
+
+    Once max_size entries are stored, the least recently used entry is evicted to make room for the next.
+
+    ...
+
+    Attributes
+    ----------
+    max_size : int
+        the maximum number of responses to store
+    ttl : float
+        the number of seconds a response is cached for
+    hits : int
+        the number of lookups that found a cached response
+    misses : int
+        the number of lookups that did not find a cached response
+    """
+
+    def __init__(self, max_size: int = 1024, ttl: float = 300):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key: str, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class CachingSession:
+    """
+    A session wrapper that caches successful, unauthenticated GET responses
+
+    Requests carrying an authorization or active profile header always go to the network, so user-specific data is
+    never shared. Each cache hit returns a fresh response object, so callers can't affect each other.
+
+    ...
+
+    Attributes
+    ----------
+    session : requests.Session | Http2Session | Cassette
+        the session used to send requests that aren't served from the cache
+    cache : ResponseCache
+        the cache of responses, which may be shared between several sessions
+    """
+
+    def __init__(self, session, cache: ResponseCache = None):
+        self.session = session
+        self.cache = cache if cache is not None else ResponseCache()
+
+    def get(self, url: str, headers=None, params=None, **kwargs):
+        if params or kwargs or any(header.lower() in PRIVATE_HEADERS for header in headers or {}):
+            return self.session.get(url, headers=headers, params=params, **kwargs)
+
+        cached = self.cache.get(url)
+        if cached is not None:
+            return build_response(*cached)
+
+        response = self.session.get(url, headers=headers)
+        if response.status_code == 200:
+            self.cache.set(url, (str(response.url), response.status_code, response.content,
+                                 {"Content-Type": response.headers.get("Content-Type", "application/json")}))
+        return response
+
+    def post(self, url: str, **kwargs):
+        return self.session.post(url, **kwargs)
+
+    def close(self):
+        self.session.close()
@@ -0,0 +1,142 @@
+import gzip
+import hashlib
+import json
+import os
+import re
+import threading
+from urllib.parse import urlsplit
+import requests
+from .cache import PRIVATE_HEADERS
+from .utils import build_response
+
+CASSETTE_VERSION = 1
+
+# Requests to these hosts send passwords and return tokens, so they are never recorded
+LOGIN_HOSTS = ("login.tvnz.co.nz",)
+TOKEN_PARAMETERS = re.compile(r"((?:access_token|id_token)=)[^&#]*")
+
+
+class Cassette:
+    """
+    A session wrapper that records requests and their responses to disk, and can replay them later without a network
+
+    Interactions are keyed by their method and full URL (including query parameters), so each replayed request is a
+    single dictionary lookup. Requests sent with an authorization or active profile header also have a hash of those
+    headers in their key, so different users and profiles don't overwrite each other. Cassettes are stored as
+    gzip-compressed JSON.
+
+    Request headers and bodies are never recorded, requests to the login service are passed through without being
+    recorded, and access and ID tokens are removed from recorded URLs. Responses to authenticated requests (e.g. account
+    details) are recorded, so cassettes recorded while logged in may still contain personal information.
+
+    ...
+
+    Attributes
+    ----------
+    path : str
+        the file the cassette is loaded from and saved to
+    mode : str
+        "replay", to only serve recorded responses, "record", to send requests and save their responses to a new
+        cassette, overwriting any existing file, or "append", to add to (and update) the responses in an existing one
+    session : requests.Session | Http2Session
+        the session used to send requests while recording, None when replaying
+    interactions : dict
+        the recorded responses, keyed by "METHOD URL"
+    """
+
+    def __init__(self, path: str, mode: str = "replay", session=None):
+        if mode not in ("record", "append", "replay"):
+            raise ValueError(f"Cassette mode must be 'record', 'append' or 'replay', not '{mode}'")
+        self.path = path
+        self.mode = mode
+        # Replaying never touches the network, so no session is needed
+        if session is None and self.recording:
+            session = requests.Session()
+        self.session = session
+        self.interactions = {}
+        self._lock = threading.Lock()
+
+        if mode == "replay" and not os.path.exists(path):
+            raise FileNotFoundError(f"No cassette found at {path}")
+        if mode == "replay" or (mode == "append" and os.path.exists(path)):
+            self.load()
+
+    @property
+    def recording(self) -> bool:
+        return self.mode != "replay"
+
+    @staticmethod
+    def key(method: str, url: str, params=None, headers=None) -> str:
+        # Normalise the URL so requests made with params match those made with the parameters already in the URL
+        if params:
+            url = requests.Request(method, url, params=params).prepare().url
+        key = f"{method.upper()} {url}"
+
+        # Tell different users and profiles apart by a hash of their headers, so the tokens themselves aren't stored
+        private = sorted(f"{name.lower()}:{value}" for name, value in (headers or {}).items()
+                         if name.lower() in PRIVATE_HEADERS and value)
+        if private:
+            key += " #" + hashlib.sha256("\n".join(private).encode("utf-8")).hexdigest()[:16]
+        return key
+
+    def get(self, url: str, headers=None, params=None, **kwargs):
+        return self._request("GET", url, params, headers, lambda: self.session.get(url, headers=headers,
+                                                                                   params=params, **kwargs))
+
+    def post(self, url: str, headers=None, params=None, **kwargs):
+        return self._request("POST", url, params, headers, lambda: self.session.post(url, headers=headers,
+                                                                                     params=params, **kwargs))
+
+    def _request(self, method: str, url: str, params, headers, send):
+        key = self.key(method, url, params, headers)
+
+        if self.mode == "replay":
+            interaction = self.interactions.get(key)
+            if interaction is None:
+                raise requests.ConnectionError(f"No recorded response for {key} in cassette {self.path}")
+            return build_response(
+                interaction["url"],
+                interaction["status"],
+                interaction["body"].encode("utf-8", errors="surrogateescape"),
+                {"Content-Type": interaction["contentType"]} if interaction["contentType"] else None
+            )
+
+        response = send()
+        if urlsplit(url).hostname in LOGIN_HOSTS:
+            return response
+        with self._lock:
+            self.interactions[key] = {
+                "url": TOKEN_PARAMETERS.sub(r"\1REDACTED", str(response.url)),
+                "status": response.status_code,
+                "contentType": response.headers.get("Content-Type"),
+                "body": response.content.decode("utf-8", errors="surrogateescape")
+            }
+        return response
+
+    def load(self):
+        """
+        Loads the recorded interactions from the cassette file
+        """
+        with gzip.open(self.path, "rt", encoding="utf-8") as f:
+            cassette = json.load(f)
+        if cassette.get("version") != CASSETTE_VERSION:
+            raise ValueError(f"Unsupported cassette version {cassette.get('version')} in {self.path}")
+        self.interactions = cassette["interactions"]
+
+    def save(self):
+        """
+        Saves the recorded interactions to the cassette file
+        """
+        with self._lock:
+            cassette = {"version": CASSETTE_VERSION, "interactions": dict(self.interactions)}
+        with gzip.open(self.path, "wt", encoding="utf-8") as f:
+            json.dump(cassette, f, separators=(",", ":"))
+
+    def close(self):
+        """
+        Saves the cassette if recording, and closes the underlying session
+        """
+        if self.recording:
+            self.save()
+        if self.session is not None:
+            self.session.close()
@@ -0,0 +1,75 @@
+import threading
+import time
+from collections import deque
+
+WINDOW = 60.0
+
+
+class DeadlineExceeded(Exception):
+    # Not a RequestException, so it isn't reported as a failed request by get_json
+    pass
+
+
+class RateLimitedSession:
+    """
+    A session wrapper that sends at most requests_per_minute requests in any 60 second window
+
+    Once the budget is used up, requests block until the oldest request in the window expires. The budget is shared
+    between every thread using the session. If a deadline is set, requests that would have to wait past it raise
+    DeadlineExceeded instead of blocking.
+
+    ...
+
+    Attributes
+    ----------
+    session : requests.Session | Http2Session | CachingSession | Cassette
+        the session used to send requests
+    requests_per_minute : int
+        the maximum number of requests sent in any 60 second window
+    deadline : float
+        the time.monotonic() time requests must be sent by, or None to always wait for the budget
+    """
+
+    def __init__(self, session, requests_per_minute: int = 60):
+        self.session = session
+        self.requests_per_minute = requests_per_minute
+        self.deadline = None
+        self._sent = deque()
+        self._lock = threading.Lock()
+
+    def _expire(self, now: float):
+        while self._sent and self._sent[0] <= now - WINDOW:
+            self._sent.popleft()
+
+    def wait_time(self) -> float:
+        # The number of seconds until a request can be sent without blocking
+        with self._lock:
+            now = time.monotonic()
+            self._expire(now)
+            if len(self._sent) < self.requests_per_minute:
+                return 0.0
+            return self._sent[0] + WINDOW - now
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._expire(now)
+                if len(self._sent) < self.requests_per_minute:
+                    self._sent.append(now)
+                    return
+                delay = self._sent[0] + WINDOW - now
+                if self.deadline is not None and now + delay > self.deadline:
+                    raise DeadlineExceeded(f"The request budget won't free up for another {delay:.1f} seconds")
+            time.sleep(delay)
+
+    def get(self, url: str, **kwargs):
+        self.acquire()
+        return self.session.get(url, **kwargs)
+
+    def post(self, url: str, **kwargs):
+        self.acquire()
+        return self.session.post(url, **kwargs)
+
+    def close(self):
+        self.session.close()
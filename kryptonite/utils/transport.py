@@ -0,0 +1,56 @@
+import json
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+# Errors raised by the optional HTTP/2 transport, caught alongside requests' own exceptions in utils.get_json
+TRANSPORT_ERRORS = (httpx.HTTPError, json.JSONDecodeError) if httpx else ()
+
+
+class Http2Session:
+    """
+    A drop-in replacement for requests.Session that sends requests over HTTP/2
+
+    Requests to the same host are multiplexed over a single connection, so many concurrent metadata requests
+    can share one socket instead of each opening their own. Requires the optional "http2" extra
+    (pip install kryptonite[http2]).
+
+    ...
+
+    Attributes
+    ----------
+    client : httpx.Client
+        the underlying HTTP/2 capable client, which is safe to share between threads
+    """
+
+    def __init__(self, max_connections: int = 10, timeout: float = 30.0):
+        if httpx is None:
+            raise ImportError("HTTP/2 support requires httpx, install it with: pip install kryptonite[http2]")
+        self.client = httpx.Client(
+            http2=True,
+            timeout=timeout,
+            limits=httpx.Limits(max_connections=max_connections),
+        )
+
+    @staticmethod
+    def _headers(headers=None, cookies=None) -> dict:
+        # requests skips headers set to None (e.g. an unset active profile), httpx would raise a TypeError instead
+        headers = {name: value for name, value in (headers or {}).items() if value is not None}
+        # httpx deprecates per-request cookies, so send them as a Cookie header instead
+        if cookies:
+            cookie = "; ".join(f"{name}={value}" for name, value in cookies.items())
+            headers["Cookie"] = f"{headers['Cookie']}; {cookie}" if headers.get("Cookie") else cookie
+        return headers
+
+    def get(self, url: str, headers=None, params=None, cookies=None, allow_redirects=True):
+        return self.client.get(url, headers=self._headers(headers, cookies), params=params,
+                               follow_redirects=allow_redirects)
+
+    def post(self, url: str, headers=None, params=None, data=None, json=None, cookies=None, allow_redirects=True):
+        return self.client.post(url, headers=self._headers(headers, cookies), params=params, data=data, json=json,
+                                follow_redirects=allow_redirects)
+
+    def close(self):
+        self.client.close()
@@ -2,6 +2,8 @@ import requests
 import shutil
 import secrets
 import string
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, as_completed, wait
+from .transport import TRANSPORT_ERRORS
 
 def process_show(show_metadata):
     return {
@@ -30,14 +32,56 @@ def process_show(show_metadata):
             'aspectRatio': show_metadata['portraitTileImage']['aspectRatio']
         } if show_metadata["portraitTileImage"] else None
     }
-def get_json(url: str, headers=None) -> dict:
+def get_json(url: str, headers=None, session=None) -> dict:
+    # Use the given session (requests.Session or Http2Session) so connections are reused between requests
+    client = session if session is not None else requests
     try:
-        response = requests.get(url, headers=headers)
+        response = client.get(url, headers=headers)
         response.raise_for_status()
         return response.json()
-    except requests.RequestException as e:
+    except (requests.RequestException, *TRANSPORT_ERRORS) as e:
         raise RuntimeError(f"Error fetching data from {url}: {e}")
 
+def map_concurrent(func, items, max_workers: int = 1) -> list:
+    # Apply func to each item using up to max_workers threads, returning the results in the same order as items
+    items = list(items)
+    if max_workers <= 1 or len(items) <= 1:
+        return [func(item) for item in items]
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(items))) as executor:
+        return list(executor.map(func, items))
+
+def build_response(url: str, status_code: int, content: bytes, headers=None) -> requests.Response:
+    # Build a requests.Response from stored data so replayed responses behave like real ones
+    response = requests.Response()
+    response.url = url
+    response.status_code = status_code
+    response._content = content
+    response.headers.update(headers or {})
+    response.encoding = "utf-8"
+    return response
+
+def iter_concurrent(func, items, max_workers: int = 1):
+    # Apply func to each item using up to max_workers threads, yielding (item, result, error) tuples as each finishes.
+    # Only a few items are in flight at once, so items can be a lazy iterator over millions of entries, and an error
+    # for one item is yielded rather than raised so it doesn't stop the rest
+    def call(item):
+        try:
+            return item, func(item), None
+        except Exception as e:
+            return item, None, e
+
+    max_workers = max(max_workers, 1)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        pending = set()
+        for item in items:
+            pending.add(executor.submit(call, item))
+            if len(pending) >= max_workers * 2:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+        for future in as_completed(pending):
+            yield future.result()
+
 def generate_nonce(length=32):
     alphabet = string.ascii_letters + string.digits
     nonce = ''.join(secrets.choice(alphabet) for _ in range(length))
@@ -72,6 +116,13 @@ def convertDuration(isoDuration):
     return duration
 
 
+def durationSeconds(duration):
+    # Convert a duration from convertDuration into a total number of seconds
+    if duration is None:
+        return None
+    return duration["hours"] * 3600 + duration["minutes"] * 60 + duration["seconds"]
+
+
 def parseSeasonData(seasonData):
     seasonEpisodes = {
         "season_number": seasonData["id"].split("/")[-1],
@@ -0,0 +1,108 @@
+import gzip
+import http.server
+import json
+import threading
+import pytest
+import requests
+from kryptonite.utils import cassette as cassette_module
+from kryptonite.utils.cassette import Cassette
+
+
+class _Handler(http.server.BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path == "/missing":
+            self.send_response(404)
+            self.end_headers()
+            return
+        if self.path == "/redirect":
+            self.send_response(302)
+            self.send_header("Location", "/callback?access_token=secret&state=1")
+            self.end_headers()
+            return
+        body = json.dumps({"path": self.path, "authorization": self.headers.get("Authorization")}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    httpd = http.server.ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{httpd.server_port}"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def test_record_then_replay(server, tmp_path):
+    path = str(tmp_path / "cassette.gz")
+    recorder = Cassette(path, mode="record")
+    assert recorder.get(f"{server}/shows", params={"page": 2}).json()["path"] == "/shows?page=2"
+    assert recorder.get(f"{server}/missing").status_code == 404
+    recorder.close()
+
+    player = Cassette(path)
+    assert player.get(f"{server}/shows?page=2").json()["path"] == "/shows?page=2"
+    missing = player.get(f"{server}/missing")
+    assert missing.status_code == 404
+    with pytest.raises(requests.HTTPError):
+        missing.raise_for_status()
+    with pytest.raises(requests.ConnectionError):
+        player.get(f"{server}/never-recorded")
+
+
+def test_profiles_are_recorded_separately(server, tmp_path):
+    path = str(tmp_path / "cassette.gz")
+    recorder = Cassette(path, mode="record")
+    for token in ("alice", "bob"):
+        recorder.get(f"{server}/my-list", headers={"Authorization": f"Bearer {token}"})
+    recorder.close()
+
+    player = Cassette(path)
+    for token in ("alice", "bob"):
+        response = player.get(f"{server}/my-list", headers={"Authorization": f"Bearer {token}"})
+        assert response.json()["authorization"] == f"Bearer {token}"
+    with pytest.raises(requests.ConnectionError):
+        player.get(f"{server}/my-list")
+
+
+def test_tokens_are_not_recorded(server, tmp_path, monkeypatch):
+    path = str(tmp_path / "cassette.gz")
+    recorder = Cassette(path, mode="record")
+    recorder.get(f"{server}/redirect")
+    recorder.get(f"{server}/account", headers={"Authorization": "Bearer secret"})
+    monkeypatch.setattr(cassette_module, "LOGIN_HOSTS", ("127.0.0.1",))
+    recorder.get(f"{server}/login")
+    recorder.close()
+
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        contents = f.read()
+    assert "/login" not in contents
+    # The only place the token appears is the echoed response body, never a URL or key
+    interactions = json.loads(contents)["interactions"]
+    assert all("secret" not in key for key in interactions)
+    assert all("secret" not in interaction["url"] for interaction in interactions.values())
+
+
+def test_append_keeps_recorded_responses(server, tmp_path):
+    path = str(tmp_path / "cassette.gz")
+    for mode, name in (("record", "first"), ("append", "second")):
+        recorder = Cassette(path, mode=mode)
+        recorder.get(f"{server}/{name}")
+        recorder.close()
+
+    player = Cassette(path)
+    assert player.session is None
+    assert player.get(f"{server}/first").json()["path"] == "/first"
+    assert player.get(f"{server}/second").json()["path"] == "/second"
+
+    recorder = Cassette(path, mode="record")
+    recorder.get(f"{server}/third")
+    recorder.close()
+    with pytest.raises(requests.ConnectionError):
+        Cassette(path).get(f"{server}/first")
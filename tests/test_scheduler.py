@@ -0,0 +1,72 @@
+import time
+from kryptonite.kryptonite import Tvnz
+from kryptonite.scheduler import CrawlScheduler
+from kryptonite.utils.utils import build_response
+
+
+class _Session:
+    def __init__(self):
+        self.urls = []
+
+    def get(self, url, **kwargs):
+        self.urls.append(url)
+        return build_response(url, 200, b"{}", {"Content-Type": "application/json"})
+
+    def close(self):
+        pass
+
+
+def _scheduler(**kwargs):
+    return CrawlScheduler(Tvnz(session=_Session()), **kwargs)
+
+
+def _due(scheduler, key, due, popularity=1.0):
+    job = scheduler.add_job(key, lambda: None, interval=3600, popularity=popularity)
+    job.next_run = due
+    scheduler._schedule(job)
+    return job
+
+
+def test_jobs_run_by_how_long_they_have_been_due_and_popularity():
+    scheduler = _scheduler(aging=60)
+    now = time.monotonic()
+    _due(scheduler, "recent", now - 20)
+    _due(scheduler, "popular", now - 10, popularity=5)
+    _due(scheduler, "old", now - 600)
+    _due(scheduler, "future", now + 100, popularity=100)
+
+    # "popular" is due later than "recent", but its popularity is worth an extra 4 minutes of waiting
+    assert [scheduler._next_job(now).key for _ in range(3)] == ["old", "popular", "recent"]
+    assert scheduler._next_job(now) is None
+
+
+def test_heaps_stay_bounded():
+    scheduler = _scheduler()
+    for i in range(1000):
+        scheduler.add_job(f"kept:{i % 10}", lambda: None, interval=60, popularity=1 + i % 7)
+        scheduler.add_job(f"removed:{i}", lambda: None, interval=60)
+        scheduler.remove_job(f"removed:{i}")
+        assert len(scheduler._waiting) + len(scheduler._ready) <= 2 * len(scheduler.jobs) + 16
+
+    now = time.monotonic()
+    keys = {scheduler._next_job(now).key for _ in range(10)}
+    assert keys == {f"kept:{i}" for i in range(10)}
+    assert scheduler._next_job(now) is None
+
+
+def test_run_stops_on_time_when_a_job_needs_more_budget():
+    scheduler = _scheduler(requests_per_minute=2)
+    results = []
+    scheduler.on_result = lambda key, result, error: results.append(key)
+    session = scheduler.tvnz.session
+    job = scheduler.add_job("pages", lambda: [session.get(f"https://example.com/{page}") for page in range(3)],
+                            interval=3600)
+
+    start = time.monotonic()
+    assert scheduler.run(duration=1) == 0
+    assert time.monotonic() - start < 1.5
+    # The job ran out of budget rather than failing, so it is still due and runs first next time
+    assert results == []
+    assert job.failures == 0
+    assert scheduler._next_job(time.monotonic()) is job
+    assert scheduler.budget.deadline is None